@@ -0,0 +1,808 @@
+# benchmark.py
+"""Performance benchmarks for the FibroTracker backend.
+
+Each benchmark runs against a throwaway database in a temp directory, so
+it never touches fibrotracker.db.
+
+Usage:
+    python benchmark.py storage [--seconds 5] [--readers 4] [--writers 2]
+    python benchmark.py projection [--days 365]
+    python benchmark.py weekly [--days 90 365 1000]
+    python benchmark.py ingest [--rows 5000]
+    python benchmark.py excel [--rows 1000 10000 100000]
+    python benchmark.py kernel [--patients 1000 10000 100000]
+    python benchmark.py impute [--users 100 1000 10000] [--days 7]
+    python benchmark.py triggers [--patients 300] [--weeks 4] [--window 14]
+    python benchmark.py screening [--forms 10 100 1000]
+    python benchmark.py compact [--repeat 2000]
+    python benchmark.py startup [--runs 3] [--baseline old_app.py]
+"""
+import argparse
+import json
+import os
+import multiprocessing
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from tests.reference import (
+    fit_standin_screening_model, legacy_impute_daily_data, legacy_score_screening, legacy_week_metrics,
+    random_entry_history, random_pain_weeks, screening_answer_grid,
+)
+
+
+def load_app(db_path):
+    """Import app.py against a scratch database."""
+    os.environ['FIBROTRACKER_DB'] = db_path
+    import app
+    return app
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def seed_daily_entries(conn, users, days, start=date(2025, 1, 1)):
+    """Insert `users` users with `days` consecutive daily entries each."""
+    rng = random.Random(42)
+    user_ids = []
+    with conn:
+        for u in range(users):
+            cur = conn.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)',
+                               (f'bench_{u}_{time.time_ns()}', 'x'))
+            user_ids.append(cur.lastrowid)
+        rows = []
+        for uid in user_ids:
+            for d in range(days):
+                sss = {'fatigue': rng.randint(0, 3), 'cognitive': rng.randint(0, 3),
+                       'sleep': rng.randint(0, 3), 'somatic': rng.randint(0, 3)}
+                rows.append((uid, (start + timedelta(days=d)).isoformat(),
+                             rng.randint(0, 10), rng.randint(0, 10), rng.randint(0, 10),
+                             rng.randint(0, 10), rng.randint(0, 10),
+                             '["neck", "lower_back"]', json.dumps(sss),
+                             rng.choice(['Light', 'Moderate', 'Heavy'])))
+        conn.executemany('''
+            INSERT INTO daily_entries (user_id, entry_date, pain_score, fatigue_score, stress_score,
+                                       mood_score, sleep_quality, wpi, sss, workload)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    return user_ids
+
+
+# **************** STORAGE PROFILE / CONCURRENCY **********************************
+
+LEGACY_PROFILE = {
+    # What the app ran with before the storage profile existed
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'cache_size': -2000,
+    'mmap_size': 0,
+    'temp_store': 'DEFAULT',
+    'busy_timeout': 5000,
+}
+
+
+def _open(app, path, profile):
+    conn = sqlite3.connect(path, timeout=profile['busy_timeout'] / 1000.0,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    app.apply_storage_profile(conn, profile)
+    return conn
+
+
+def _run_mixed_workload(app, path, profile, user_ids, readers, writers, seconds):
+    deadline = time.perf_counter() + seconds
+    read_lat, write_lat = [], []
+    errors = {'locked': 0}
+    lock = threading.Lock()
+    next_day = [0]
+
+    def reader():
+        conn = _open(app, path, profile)
+        rng = random.Random()
+        local = []
+        while time.perf_counter() < deadline:
+            uid = rng.choice(user_ids)
+            t0 = time.perf_counter()
+            conn.execute('SELECT * FROM daily_entries WHERE user_id = ? ORDER BY entry_date ASC',
+                         (uid,)).fetchall()
+            local.append(time.perf_counter() - t0)
+        conn.close()
+        with lock:
+            read_lat.extend(local)
+
+    def writer():
+        conn = _open(app, path, profile)
+        rng = random.Random()
+        local = []
+        while time.perf_counter() < deadline:
+            with lock:
+                next_day[0] += 1
+                day = next_day[0]
+            entry_date = (date(2040, 1, 1) + timedelta(days=day)).isoformat()
+            t0 = time.perf_counter()
+            try:
+                with conn:
+                    conn.execute('''
+                        INSERT INTO daily_entries (user_id, entry_date, pain_score, fatigue_score, sleep_quality)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (rng.choice(user_ids), entry_date, 5, 5, 5))
+                local.append(time.perf_counter() - t0)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors['locked'] += 1
+        conn.close()
+        with lock:
+            write_lat.extend(local)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return {
+        'reads_per_s': len(read_lat) / seconds,
+        'read_p95_ms': percentile(read_lat, 95) * 1000,
+        'writes_per_s': len(write_lat) / seconds,
+        'write_p95_ms': percentile(write_lat, 95) * 1000,
+        'lock_errors': errors['locked'],
+    }
+
+
+def bench_storage(args):
+    """Reads vs. writes under the legacy and the configured storage profile."""
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'seed.db'))
+    seed = app.get_db_connection()
+    user_ids = seed_daily_entries(seed, args.users, args.days)
+    seed.close()
+    app.db_pool.close_all()
+
+    profiles = [('legacy', LEGACY_PROFILE), ('configured', app.STORAGE_PROFILE)]
+    print(f"{args.users} users x {args.days} days, {args.readers} readers, "
+          f"{args.writers} writers, {args.seconds}s per phase")
+    print(f"{'profile':<12}{'phase':<12}{'reads/s':>10}{'read p95':>11}"
+          f"{'writes/s':>10}{'write p95':>11}{'locked':>8}")
+    for name, profile in profiles:
+        path = os.path.join(tmp, f'{name}.db')
+        src = sqlite3.connect(os.path.join(tmp, 'seed.db'))
+        dst = sqlite3.connect(path)
+        src.backup(dst)
+        src.close()
+        dst.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+        dst.close()
+
+        read_only = _run_mixed_workload(app, path, profile, user_ids, args.readers, 0, args.seconds)
+        mixed = _run_mixed_workload(app, path, profile, user_ids, args.readers, args.writers, args.seconds)
+        for phase, r in (('reads only', read_only), ('mixed', mixed)):
+            print(f"{name:<12}{phase:<12}{r['reads_per_s']:>10.0f}{r['read_p95_ms']:>9.2f}ms"
+                  f"{r['writes_per_s']:>10.0f}{r['write_p95_ms']:>9.2f}ms{r['lock_errors']:>8}")
+        kept = mixed['reads_per_s'] / read_only['reads_per_s'] if read_only['reads_per_s'] else 0
+        print(f"{name:<12}read throughput kept under concurrent writes: {kept:.0%}")
+
+
+# **************** COLUMN PROJECTION **********************************
+
+def bench_projection(args):
+    """Bytes and time per request: SELECT * vs. each endpoint's declared projection."""
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'projection.db'))
+    conn = app.get_db_connection()
+    user_ids = seed_daily_entries(conn, args.users, args.days)
+
+    projections = [
+        ('dashboard_daily', app.DASHBOARD_DAILY_COLUMNS),
+        ('report rows / exports', app.REPORT_ROW_COLUMNS),
+        ('correlations', app.CORRELATION_COLUMNS),
+        ('weekly analysis', app.ANALYSIS_COLUMNS),
+    ]
+    print(f"{args.days} entries per user, {args.repeat} requests each")
+    print(f"{'endpoint':<24}{'cols':>5}{'rows/req':>10}{'bytes/req':>12}{'ms/req':>9}"
+          f"{'  vs SELECT *':>14}")
+
+    def measure(sql):
+        nbytes = nrows = 0
+        t0 = time.perf_counter()
+        for i in range(args.repeat):
+            rows = conn.execute(sql, (user_ids[i % len(user_ids)],)).fetchall()
+            nrows += len(rows)
+            nbytes += sum(app.QueryStats.row_bytes(r) for r in rows)
+        elapsed = (time.perf_counter() - t0) * 1000 / args.repeat
+        return nrows / args.repeat, nbytes / args.repeat, elapsed
+
+    where = ' FROM daily_entries WHERE user_id = ? ORDER BY entry_date ASC'
+    rows, full_bytes, full_ms = measure('SELECT *' + where)
+    print(f"{'SELECT *':<24}{len(app.DAILY_ENTRY_COLUMNS):>5}{rows:>10.0f}{full_bytes:>12.0f}{full_ms:>9.3f}")
+    for name, columns in projections:
+        rows, nbytes, ms = measure(f"SELECT {', '.join(columns)}" + where)
+        print(f"{name:<24}{len(columns):>5}{rows:>10.0f}{nbytes:>12.0f}{ms:>9.3f}"
+              f"{nbytes / full_bytes:>13.0%}")
+    conn.close()
+
+
+# **************** WEEKLY AGGREGATION **********************************
+
+def legacy_weekly_aggregate(conn, user_id):
+    """The pre-SQL /api/dashboard/weekly implementation, kept for comparison."""
+    from datetime import datetime
+    entries = conn.execute('SELECT * FROM daily_entries WHERE user_id = ? ORDER BY entry_date ASC',
+                           (user_id,)).fetchall()
+    weekly_data = {}
+    for e in entries:
+        entry = dict(e)
+        entry_date = datetime.strptime(entry['entry_date'], '%Y-%m-%d')
+        week_key = str((entry_date - timedelta(days=entry_date.weekday())).date())
+        data = weekly_data.setdefault(week_key, {'pain': [], 'fatigue': [], 'sleep': [],
+                                                 'stress': [], 'mood': [], 'workloads': []})
+        sss = json.loads(entry['sss']) if entry.get('sss') else {}
+        data['pain'].append(entry.get('pain_score', 0) or 0)
+        data['fatigue'].append(sss.get('fatigue', 0))
+        data['sleep'].append(sss.get('sleep', 0))
+        data['stress'].append(entry.get('stress_score', 0) or 0)
+        data['mood'].append(entry.get('mood_score', 0) or 0)
+        if entry.get('workload') is not None:
+            data['workloads'].append(entry['workload'])
+    result = []
+    for i, (week_start, data) in enumerate(sorted(weekly_data.items()), start=1):
+        result.append({
+            'week_number': i,
+            'week_start': week_start,
+            'avg_pain': round(sum(data['pain']) / len(data['pain']), 2),
+            'avg_fatigue': round(sum(data['fatigue']) / len(data['fatigue']), 2),
+            'avg_sleep': round(sum(data['sleep']) / len(data['sleep']), 2),
+            'avg_stress': round(sum(data['stress']) / len(data['stress']), 2),
+            'avg_mood': round(sum(data['mood']) / len(data['mood']), 2),
+            'avg_workload': max(set(data['workloads']), key=data['workloads'].count) if data['workloads'] else None,
+        })
+    return result
+
+
+def bench_weekly(args):
+    """Legacy Python weekly grouping vs. aggregate_weekly() in SQLite."""
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'weekly.db'))
+    conn = app.get_db_connection()
+    # Backfill the typed columns the way the migration would
+    print(f"{'days':>6}{'weeks':>7}{'legacy ms':>11}{'sql ms':>9}{'speedup':>9}  averages match")
+    for days in args.days:
+        (user_id,) = seed_daily_entries(conn, 1, days)
+        app.backfill_typed_scores(conn)
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            legacy = legacy_weekly_aggregate(conn, user_id)
+        legacy_ms = (time.perf_counter() - t0) * 1000 / args.repeat
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            engine = app.aggregate_weekly(conn, user_id)
+        sql_ms = (time.perf_counter() - t0) * 1000 / args.repeat
+
+        keys = ('week_number', 'week_start', 'avg_pain', 'avg_fatigue', 'avg_sleep', 'avg_stress', 'avg_mood')
+        match = [{k: w[k] for k in keys} for w in legacy] == [{k: w[k] for k in keys} for w in engine]
+        print(f"{days:>6}{len(engine):>7}{legacy_ms:>11.2f}{sql_ms:>9.2f}{legacy_ms / sql_ms:>8.1f}x  {match}")
+    conn.close()
+
+
+# **************** BULK INGESTION **********************************
+
+def _entry_payloads(rows, start=date(2015, 1, 1)):
+    rng = random.Random(11)
+    for i in range(rows):
+        yield {
+            'entry_date': (start + timedelta(days=i)).isoformat(),
+            'pain_score': rng.randint(0, 10),
+            'fatigue_score': rng.randint(0, 10),
+            'stress_score': rng.randint(0, 10),
+            'mood_score': rng.randint(0, 10),
+            'sleep_quality': rng.randint(0, 10),
+            'workload': rng.choice(['light', 'moderate', 'heavy']),
+            'sss': {'fatigue': rng.randint(0, 3), 'cognitive': rng.randint(0, 3),
+                    'sleep': rng.randint(0, 3), 'somatic': rng.randint(0, 3)},
+            'wpi': {'neck': True, 'upper_back': rng.random() < 0.5},
+        }
+
+
+def bench_ingest(args):
+    """Rows/s for per-entry POST /api/daily-entry vs. one POST /api/daily-entries/bulk."""
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'ingest.db'))
+    conn = app.get_db_connection()
+    with conn:
+        user_ids = [conn.execute("INSERT INTO users (username, email, password_hash) VALUES (?, ?, 'x')",
+                                 (f'ingest{i}', f'ingest{i}@example.com')).lastrowid for i in range(3)]
+    conn.close()
+
+    client = app.app.test_client()
+
+    def login(user_id):
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+
+    payloads = list(_entry_payloads(args.rows))
+    print(f"{'mode':<22}{'rows':>7}{'seconds':>9}{'rows/s':>10}")
+
+    single_rows = payloads[:args.single_rows]
+    login(user_ids[0])
+    t0 = time.perf_counter()
+    for p in single_rows:
+        assert client.post('/api/daily-entry', json=p).status_code == 200
+    elapsed = time.perf_counter() - t0
+    print(f"{'per-entry POST':<22}{len(single_rows):>7}{elapsed:>9.2f}{len(single_rows) / elapsed:>10.0f}")
+
+    login(user_ids[1])
+    t0 = time.perf_counter()
+    body = client.post('/api/daily-entries/bulk', json=payloads).get_json()
+    elapsed = time.perf_counter() - t0
+    print(f"{'bulk JSON array':<22}{body['created']:>7}{elapsed:>9.2f}{body['created'] / elapsed:>10.0f}")
+
+    login(user_ids[2])
+    ndjson = '\n'.join(json.dumps(p) for p in payloads)
+    t0 = time.perf_counter()
+    body = client.post('/api/daily-entries/bulk', data=ndjson,
+                       content_type='application/x-ndjson').get_json()
+    elapsed = time.perf_counter() - t0
+    print(f"{'bulk NDJSON':<22}{body['created']:>7}{elapsed:>9.2f}{body['created'] / elapsed:>10.0f}")
+
+    # Replaying the same batch must report every row as a conflict
+    body = client.post('/api/daily-entries/bulk', json=payloads[:100]).get_json()
+    print(f"replay of 100 rows: created={body['created']} conflicts={body['conflicts']}")
+    return 0 if body['conflicts'] == 100 else 1
+
+
+# **************** EXCEL EXPORT **********************************
+
+def legacy_final_excel(app, conn, user_id):
+    """The pre-streaming export_final_excel body: list of dicts -> DataFrame -> BytesIO."""
+    import io
+    import pandas as pd
+    entries = app.fetch_daily_entries(conn, user_id, app.REPORT_ROW_COLUMNS)
+    data = [dict(zip(app.REPORT_EXCEL_HEADER, app.report_excel_row(e))) for e in entries]
+    df = pd.DataFrame(data)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name='Final_Report')
+    return buffer.getbuffer().nbytes
+
+
+def _rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _excel_export_child(app, mode, user_id, out):
+    """Run one export in a forked child so peak RSS is measured in isolation."""
+    baseline = _rss_bytes()
+    t0 = time.perf_counter()
+    if mode == 'legacy':
+        with app.app.app_context():
+            nbytes = legacy_final_excel(app, app.get_db_connection(), user_id)
+    else:
+        client = app.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        resp = client.get('/api/report/final/export-excel', buffered=False)
+        nbytes = sum(len(chunk) for chunk in resp.response)
+        resp.close()
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    out.put((elapsed, max(0, peak - baseline), nbytes))
+
+
+def bench_excel(args):
+    """Latency and peak RSS growth of the final-report Excel export: pandas vs. constant_memory streaming."""
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'excel.db'))
+    ctx = multiprocessing.get_context('fork')
+    print(f"{'rows':>8}  {'mode':<10}{'seconds':>9}{'peak RSS MB':>13}{'xlsx KB':>10}")
+    for rows in args.rows:
+        conn = app.get_db_connection()
+        (user_id,) = seed_daily_entries(conn, 1, rows, start=date(1800, 1, 1))
+        app.backfill_typed_scores(conn)
+        conn.close()
+        for mode in ('legacy', 'streaming'):
+            out = ctx.Queue()
+            proc = ctx.Process(target=_excel_export_child, args=(app, mode, user_id, out))
+            proc.start()
+            elapsed, peak, nbytes = out.get()
+            proc.join()
+            print(f"{rows:>8}  {mode:<10}{elapsed:>9.2f}{peak / 2**20:>13.1f}{nbytes / 1024:>10.0f}")
+    return 0
+
+
+# **************** ANALYSIS KERNEL **********************************
+
+def bench_kernel(args):
+    """Per-patient Python metrics vs. weekly_pain_kernel() (parity: tests/test_analysis_kernel.py)."""
+    import numpy as np
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'kernel.db'))
+    print(f"{'patients':>9}{'legacy ms':>11}{'kernel ms':>11}{'speedup':>9}")
+    for patients in args.patients:
+        pain, n_valid = random_pain_weeks(patients)
+        lists = [[float(v) for v in row if not np.isnan(v)] for row in pain]
+
+        t0 = time.perf_counter()
+        for vals, n in zip(lists, n_valid):
+            legacy_week_metrics(app, vals, int(n))
+        legacy_ms = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        app.weekly_pain_kernel(pain, n_valid)
+        kernel_ms = (time.perf_counter() - t0) * 1000
+        print(f"{patients:>9}{legacy_ms:>11.1f}{kernel_ms:>11.1f}{legacy_ms / kernel_ms:>8.1f}x")
+    return 0
+
+
+# **************** LOCF IMPUTATION **********************************
+
+def bench_impute(args):
+    """Per-user legacy imputation loop vs. impute_daily_batch() (parity: tests/test_imputation.py)."""
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'impute.db'))
+    rng = random.Random(args.seed)
+
+    print(f"{'users':>8}{'days':>6}{'legacy ms':>11}{'batch ms':>10}{'speedup':>9}")
+    for users in args.users:
+        histories = [random_entry_history(rng, args.days) for _ in range(users)]
+        t0 = time.perf_counter()
+        for entries in histories:
+            legacy_impute_daily_data(entries)
+        legacy_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        app.impute_daily_batch(histories)
+        batch_ms = (time.perf_counter() - t0) * 1000
+        print(f"{users:>8}{args.days:>6}{legacy_ms:>11.1f}{batch_ms:>10.1f}{legacy_ms / batch_ms:>8.1f}x")
+    return 0
+
+
+# **************** TRIGGER CLUSTERING **********************************
+
+def legacy_detect_triggers(app, rows):
+    """The pre-cache trigger detection: a fresh KMeans(n_init=10) per call."""
+    import numpy as np
+    from sklearn.cluster import KMeans
+    if len(rows) < 7:
+        return None, None
+    X = app.trigger_features(rows)
+    kmeans = KMeans(n_clusters=2, random_state=42, n_init=10).fit(X)
+    return app.TRIGGER_NAMES[int(np.argmax(X.mean(axis=0)))], kmeans.labels_, kmeans.inertia_
+
+
+def random_trigger_days(rng, days):
+    """Daily trigger rows for one patient, with a stress/sleep-heavy phase."""
+    rows = []
+    flare = rng.random() < 0.5
+    for d in range(days):
+        high = flare and (d // 5) % 2 == 1
+        rows.append({
+            'stress_score': rng.randint(5, 10) if high else rng.randint(0, 5),
+            'sleep_quality': rng.choice([None, rng.randint(0, 4) if high else rng.randint(4, 10)]),
+            'weather_sensitivity_bool': rng.choice([None, 0, 1]),
+            'sensory_score': rng.randint(0, 10),
+            'recent_infection': 1 if rng.random() < 0.05 else 0,
+            'menstrual_phase': rng.choice([None, 'NA', 'luteal', 'follicular']),
+        })
+    return rows
+
+
+def bench_triggers(args):
+    """Fresh KMeans per call vs. TriggerClusterer over weekly-shifting 14-day windows."""
+    import numpy as np
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'triggers.db'))
+    rng = random.Random(args.seed)
+    histories = [random_trigger_days(rng, 14 + 7 * args.weeks) for _ in range(args.patients)]
+    clusterer = app.TriggerClusterer(args.patients, app.TRIGGER_CLOSED_FORM_MAX_ROWS)
+
+    print(f"{'week':>5}{'legacy ms/call':>16}{'cached ms/call':>16}{'speedup':>9}"
+          f"{'inertia vs legacy (mean/max)':>30}")
+    for week in range(args.weeks + 1):
+        windows = [rows[7 * week:7 * week + args.window] for rows in histories]
+        t0 = time.perf_counter()
+        legacy = [legacy_detect_triggers(app, w) for w in windows]
+        legacy_ms = (time.perf_counter() - t0) * 1000 / len(windows)
+
+        t0 = time.perf_counter()
+        results = clusterer.detect_many(list(enumerate(windows)))
+        cached_ms = (time.perf_counter() - t0) * 1000 / len(windows)
+
+        # Fit quality: within-cluster SSE of the cached centroids over the legacy fit's
+        ratios = []
+        for user_id, w in enumerate(windows):
+            assert results[user_id][0] == legacy[user_id][0]
+            centroids = clusterer.export([user_id])[user_id]['centroids']
+            inertia = app.lloyd_two_means(app.trigger_features(w), centroids, max_iter=0)[2]
+            ratios.append(inertia / legacy[user_id][2] if legacy[user_id][2] else 1.0)
+        print(f"{week:>5}{legacy_ms:>16.3f}{cached_ms:>16.3f}{legacy_ms / cached_ms:>8.1f}x"
+              f"{np.mean(ratios):>22.4f} / {max(ratios):.4f}")
+
+    # Re-running the last week: every window is unchanged
+    t0 = time.perf_counter()
+    clusterer.detect_many(list(enumerate(windows)))
+    rerun_ms = (time.perf_counter() - t0) * 1000 / len(windows)
+    print(f"rerun{'':>16}{rerun_ms:>16.3f}{legacy_ms / rerun_ms:>8.1f}x")
+    print(json.dumps(clusterer.stats()))
+    return 0
+
+
+# **************** SCREENING **********************************
+
+def random_screening_payload(rng):
+    """One /api/screening(/batch) body with random answers, including unknown keys and string numbers."""
+    secondary = list(('secondary_headache', 'secondary_paresthesia', 'secondary_allodynia', 'secondary_ibs',
+                      'secondary_depression', 'secondary_sweating', 'secondary_sensitivity',
+                      'secondary_menstrual', 'secondary_stiffness', 'secondary_jaw', 'other'))
+    return {
+        'first_answers': {f'f{i}': rng.random() < 0.5 for i in range(1, 7)},
+        'wpi_regions': rng.sample([f'region_{i}' for i in range(19)], rng.randint(0, 12)),
+        'sss_answers': {k: rng.choice([0, 1, 2, 3, '2']) for k in ('fatigue', 'sleep', 'cognitive')},
+        'sss_somatic': {k: rng.choice([0, 1, 'x']) for k in ('headache', 'abdomenPain', 'depression')},
+        'secondary_symptoms': rng.sample(secondary, rng.randint(0, 6)),
+        'risk_factors': {f'r{i}': rng.random() < 0.4 for i in range(1, 7)},
+        'respondent_id': f'R{rng.randrange(10 ** 6):06d}',
+        'sex': rng.choice(['Female', 'Male', 'Other']),
+        'duration_4_weeks': rng.random() < 0.5,
+    }
+
+
+
+
+def bench_screening(args):
+    """One form legacy/engine/memoised, then per-form vs. batch scoring (parity: tests/test_screening_engine.py)."""
+    import contextlib
+    import io
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'screening.db'))
+
+    if app.model_registry.get('screening') is None:
+        print('fibro_risk_model.pkl not found: using a stand-in LogisticRegression')
+        app.model_registry.set('screening', fit_standin_screening_model(app))
+    model, le = app.model_registry.get('screening')
+    predictor = app.ScreeningModel(model, le)
+    rng = random.Random(args.seed)
+    a = rng.choice(screening_answer_grid(app))
+
+    n = args.repeat
+    t0 = time.perf_counter()
+    for _ in range(n):
+        legacy_score_screening(a, model, le)
+    legacy_us = (time.perf_counter() - t0) / n * 1e6
+    t0 = time.perf_counter()
+    for _ in range(n):
+        app.score_screenings([a], predictor)
+    cold_us = (time.perf_counter() - t0) / n * 1e6
+    app.screening_scorer.score(a)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        app.screening_scorer.score(a)
+    hit_us = (time.perf_counter() - t0) / n * 1e6
+    print(f"one form: legacy {legacy_us:.0f} us, engine {cold_us:.0f} us, memoised {hit_us:.1f} us")
+    print(f"model calls: {json.dumps(predictor.stats())}")
+
+    conn = app.get_db_connection()
+    user_id = conn.execute("INSERT INTO users (username, password_hash) VALUES ('bench_screening', 'x')").lastrowid
+    conn.commit()
+    print(f"{'forms':>7}{'per-form ms':>13}{'batch ms':>10}{'speedup':>9}{'forms/s':>10}")
+    for n in args.forms:
+        forms = [app.parse_community_screening(random_screening_payload(rng)) for _ in range(n)]
+        app.screening_scorer.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            for f in forms:
+                scores = app.score_screenings([f['answers']], predictor)
+                with conn:
+                    app.save_screenings(conn, user_id, [f], scores)
+            single_ms = (time.perf_counter() - t0) * 1000
+
+            t0 = time.perf_counter()
+            scores = app.screening_scorer.score_many([f['answers'] for f in forms])
+            with conn:
+                app.save_community_screenings(conn, user_id, forms, scores)
+            batch_ms = (time.perf_counter() - t0) * 1000
+        print(f"{n:>7}{single_ms:>13.1f}{batch_ms:>10.1f}{single_ms / batch_ms:>8.1f}x"
+              f"{n / batch_ms * 1000:>10.0f}")
+    conn.close()
+    print(json.dumps(app.screening_scorer.stats()))
+    return 0
+
+
+def bench_compact(args):
+    """CompactScreeningModel (NumPy softmax) vs. the sklearn LogisticRegression (parity: tests/test_screening_model.py)."""
+    import warnings
+    import joblib
+    import numpy as np
+    import pandas as pd
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    app = load_app(os.path.join(tmp, 'compact.db'))
+    if os.path.exists('fibro_risk_model.pkl'):
+        model, le = joblib.load('fibro_risk_model.pkl'), joblib.load('fibro_risk_le.pkl')
+    else:
+        print('fibro_risk_model.pkl not found: using a stand-in LogisticRegression')
+        model, le = fit_standin_screening_model(app)
+    pkl_path, npz_path = os.path.join(tmp, 'model.pkl'), os.path.join(tmp, 'model.npz')
+    joblib.dump(model, pkl_path)
+    app.CompactScreeningModel.from_sklearn(model, le).save(npz_path)
+
+    def timed(fn, n):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - t0) / n * 1e6
+
+    print(f"load: joblib {timed(lambda: joblib.load(pkl_path), 50):.0f} us ({os.path.getsize(pkl_path)} bytes), "
+          f"npz {timed(lambda: app.CompactScreeningModel.load(npz_path), 50):.0f} us "
+          f"({os.path.getsize(npz_path)} bytes)")
+    compact = app.CompactScreeningModel.load(npz_path)
+
+    rng = np.random.default_rng(args.seed)
+    X = rng.random((1000, len(app.SCREENING_FEATURES))) * [19, 12, 19, 6, 1, 1, 1.75, 1]
+    X[:, [0, 1, 2, 3]] = np.round(X[:, [0, 1, 2, 3]])
+    row = X[:1]
+    frame = pd.DataFrame(row, columns=app.SCREENING_FEATURES)
+    batch = X
+    n = args.repeat
+    print(f"{'scorer':<34}{'1 row us':>10}{'1000 rows us':>14}")
+    for name, fn, data in [
+        ('sklearn, DataFrame', model.predict_proba, (frame, pd.DataFrame(batch, columns=app.SCREENING_FEATURES))),
+        ('sklearn, ndarray', model.predict_proba, (row, batch)),
+        ('CompactScreeningModel', compact.predict_proba, (row, batch)),
+    ]:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')   # feature-name warning for the ndarray row
+            print(f"{name:<34}{timed(lambda: fn(data[0]), n):>10.1f}{timed(lambda: fn(data[1]), n // 10):>14.1f}")
+    return 0
+
+
+# Run in a fresh interpreter per measurement: argv[1] is the directory holding the app.py to import
+STARTUP_CHILD = r'''
+import json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+def rss_kb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+t0 = time.perf_counter()
+import app
+out = {'import_s': time.perf_counter() - t0, 'import_rss_kb': rss_kb(),
+       'heavy': [m for m in ('sklearn', 'pandas', 'reportlab', 'requests') if m in sys.modules]}
+registry = getattr(app, 'model_registry', None)
+if registry is not None:
+    t0 = time.perf_counter()
+    for name in registry.names():
+        registry.get(name)
+    out['models_s'] = time.perf_counter() - t0
+    out['models'] = registry.stats()
+out['total_rss_kb'] = rss_kb()
+print('STARTUP ' + json.dumps(out))
+'''
+
+
+def _startup_run(app_dir, db_path, env_overrides):
+    import subprocess
+    env = dict(os.environ, FIBROTRACKER_DB=db_path, PYTHONWARNINGS='ignore', **env_overrides)
+    # Model paths in app.py are relative to the repository root
+    proc = subprocess.run([sys.executable, '-c', STARTUP_CHILD, app_dir], env=env,
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True, check=True)
+    line = next(l for l in proc.stdout.splitlines() if l.startswith('STARTUP '))
+    return json.loads(line[len('STARTUP '):])
+
+
+def bench_startup(args):
+    """Cold `import app` time and RSS: lazy model registry vs. no mmap vs. preloading (and optionally an older app.py)."""
+    import shutil
+    import statistics
+    tmp = tempfile.mkdtemp(prefix='fibro_bench_')
+    repo = os.path.dirname(os.path.abspath(__file__))
+    variants = [('lazy', repo, {}),
+                ('no-mmap', repo, {'FIBROTRACKER_MODEL_MMAP': ''}),
+                ('preload', repo, {'FIBROTRACKER_PRELOAD_MODELS': '1'})]
+    if args.baseline:
+        baseline_dir = os.path.join(tmp, 'baseline')
+        os.makedirs(baseline_dir)
+        shutil.copy(args.baseline, os.path.join(baseline_dir, 'app.py'))
+        variants.append(('baseline', baseline_dir, {}))
+
+    print(f"{'variant':<10}{'import s':>10}{'import MB':>11}{'+models s':>11}{'total MB':>10}  heavy modules at import")
+    runs = {}
+    for name, app_dir, env in variants:
+        runs[name] = [_startup_run(app_dir, os.path.join(tmp, f'{name}.db'), env) for _ in range(args.runs)]
+        rs = runs[name]
+        models_s = statistics.median(r.get('models_s', 0.0) for r in rs)
+        print(f"{name:<10}{statistics.median(r['import_s'] for r in rs):>10.2f}"
+              f"{statistics.median(r['import_rss_kb'] for r in rs) / 1024:>11.0f}{models_s:>11.2f}"
+              f"{statistics.median(r['total_rss_kb'] for r in rs) / 1024:>10.0f}  {', '.join(rs[0]['heavy']) or '-'}")
+
+    print('\nper-model first load (lazy, first run):')
+    for name, stat in runs['lazy'][0]['models'].items():
+        detail = stat['error'] or f"{stat['load_ms']:.0f} ms, +{stat['rss_delta_kb'] / 1024:.1f} MB RSS"
+        print(f"  {name:<10} {detail}")
+    return 0
+
+
+BENCHMARKS = {
+    'storage': bench_storage,
+    'projection': bench_projection,
+    'weekly': bench_weekly,
+    'ingest': bench_ingest,
+    'excel': bench_excel,
+    'kernel': bench_kernel,
+    'impute': bench_impute,
+    'triggers': bench_triggers,
+    'screening': bench_screening,
+    'compact': bench_compact,
+    'startup': bench_startup,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='FibroTracker performance benchmarks')
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    p = sub.add_parser('storage', help=bench_storage.__doc__)
+    p.add_argument('--users', type=int, default=20)
+    p.add_argument('--days', type=int, default=365)
+    p.add_argument('--readers', type=int, default=4)
+    p.add_argument('--writers', type=int, default=2)
+    p.add_argument('--seconds', type=float, default=5.0)
+
+    p = sub.add_parser('projection', help=bench_projection.__doc__)
+    p.add_argument('--users', type=int, default=10)
+    p.add_argument('--days', type=int, default=365)
+    p.add_argument('--repeat', type=int, default=200)
+
+    p = sub.add_parser('weekly', help=bench_weekly.__doc__)
+    p.add_argument('--days', type=int, nargs='+', default=[90, 365, 1000, 2000])
+    p.add_argument('--repeat', type=int, default=50)
+
+    p = sub.add_parser('ingest', help=bench_ingest.__doc__)
+    p.add_argument('--rows', type=int, default=5000)
+    p.add_argument('--single-rows', type=int, default=500)
+
+    p = sub.add_parser('excel', help=bench_excel.__doc__)
+    p.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    p = sub.add_parser('kernel', help=bench_kernel.__doc__)
+    p.add_argument('--patients', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    p = sub.add_parser('impute', help=bench_impute.__doc__)
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--users', type=int, nargs='+', default=[100, 1000, 10000])
+    p.add_argument('--days', type=int, default=7)
+
+    p = sub.add_parser('triggers', help=bench_triggers.__doc__)
+    p.add_argument('--patients', type=int, default=300)
+    p.add_argument('--weeks', type=int, default=4)
+    p.add_argument('--window', type=int, default=14)
+    p.add_argument('--seed', type=int, default=3)
+
+    p = sub.add_parser('screening', help=bench_screening.__doc__)
+    p.add_argument('--forms', type=int, nargs='+', default=[10, 100, 1000])
+    p.add_argument('--repeat', type=int, default=2000)
+    p.add_argument('--seed', type=int, default=11)
+
+    p = sub.add_parser('compact', help=bench_compact.__doc__)
+    p.add_argument('--repeat', type=int, default=2000)
+    p.add_argument('--seed', type=int, default=5)
+
+    p = sub.add_parser('startup', help=bench_startup.__doc__)
+    p.add_argument('--runs', type=int, default=3)
+    p.add_argument('--baseline', help='an older app.py to compare against, e.g. from `git show <rev>:app.py`')
+
+    args = parser.parse_args(argv)
+    return BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app.py opens its database at import, so point it at a scratch file first
+os.environ['FIBROTRACKER_DB'] = os.path.join(tempfile.mkdtemp(prefix='fibro_test_'), 'test.db')
+
+import app as fibro_app  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return fibro_app
+
+
+@pytest.fixture
+def conn(app):
+    conn = app.get_db_connection()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def make_user(conn):
+    def make(**profile):
+        columns = ['username', 'password_hash'] + list(profile)
+        values = [f'test_{time.time_ns()}', 'x'] + list(profile.values())
+        with conn:
+            cur = conn.execute(f"INSERT INTO users ({', '.join(columns)}) VALUES ({', '.join('?' * len(values))})",
+                               values)
+        return cur.lastrowid
+    return make
+
+
+@pytest.fixture
+def client_for(app):
+    def client_for(user_id):
+        client = app.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        return client
+    return client_for
@@ -0,0 +1,180 @@
+"""Pre-optimisation reference implementations and random inputs.
+
+The parity tests pin the vectorised/batched code in app.py to these, and
+benchmark.py times against them.
+"""
+from datetime import date, timedelta
+
+
+def legacy_week_metrics(app, pain_vals, n_valid):
+    """The pre-kernel per-patient metric code from run_weekly_analysis, kept as the reference."""
+    import numpy as np
+    mean_pain = round(float(np.mean(pain_vals)), 2) if pain_vals else 0
+    pain_std = round(float(np.std(pain_vals)), 2) if len(pain_vals) >= 2 else 0
+    trend_slope = app.compute_trend_slope(pain_vals)
+    flare_threshold = mean_pain + 2 * pain_std if pain_std > 0 else mean_pain + 1
+    flare_count = sum(1 for p in pain_vals if p > flare_threshold)
+    data_completeness = round(n_valid / 7, 2)
+    if n_valid < 4 or data_completeness < 0.6:
+        risk_level = 'insufficient_data'
+    elif mean_pain > 7 or flare_count >= 3:
+        risk_level = 'High'
+    elif mean_pain >= 4:
+        risk_level = 'Moderate'
+    else:
+        risk_level = 'Low'
+    return mean_pain, pain_std, trend_slope, flare_count, risk_level
+
+
+def random_pain_weeks(patients, seed=7):
+    """(patients, 7) pain matrix with NaN gaps, a share of half-point scores, plus logged-day counts."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    pain = rng.integers(0, 11, size=(patients, 7)).astype(float)
+    pain += np.where(rng.random((patients, 7)) < 0.1, 0.5, 0.0)
+    pain = np.clip(pain, 0, 10)
+    pain[rng.random((patients, 7)) < rng.uniform(0, 0.6, size=(patients, 1))] = np.nan
+    return pain, (~np.isnan(pain)).sum(axis=1)
+
+
+def legacy_impute_daily_data(entries_dicts):
+    """The pre-columnar impute_daily_data(), kept as the parity reference."""
+    from collections import Counter
+    if not entries_dicts:
+        return []
+    numeric_fields = ['pain_score', 'fatigue_score', 'stress_score', 'mood_score',
+                      'sleep_quality', 'cognitive_difficulty', 'sensory_score']
+    categorical_fields = ['physical_activity_level', 'sleep_duration_category', 'workload']
+    result = []
+    last_known = {}
+    consec_missing = {}
+    for entry in entries_dicts:
+        row = dict(entry)
+        for f in numeric_fields:
+            val = row.get(f)
+            if val is not None:
+                last_known[f] = val
+                consec_missing[f] = 0
+            else:
+                consec_missing[f] = consec_missing.get(f, 0) + 1
+                if consec_missing[f] <= 2 and f in last_known:
+                    row[f] = last_known[f]
+        if len(result) >= 1:
+            window = result[-7:]
+            for f in categorical_fields:
+                val = row.get(f)
+                if val is None or val == '':
+                    freq = Counter(r.get(f) for r in window if r.get(f) is not None and r.get(f) != '')
+                    if freq:
+                        row[f] = freq.most_common(1)[0][0]
+        result.append(row)
+    return result
+
+
+def random_entry_history(rng, max_days):
+    """One user's entries with random gaps: None, missing keys, '' categories, ints/floats/zeros."""
+    numeric = ['pain_score', 'fatigue_score', 'stress_score', 'mood_score',
+               'sleep_quality', 'cognitive_difficulty', 'sensory_score']
+    categorical = {'physical_activity_level': ['low', 'moderate', 'high'],
+                   'sleep_duration_category': ['<5', '5-7', '>7'],
+                   'workload': ['Light', 'Moderate', 'Heavy', 'None']}
+    p_missing = rng.random()
+    entries = []
+    for d in range(rng.randint(0, max_days)):
+        e = {'entry_date': (date(2025, 1, 1) + timedelta(days=d)).isoformat(),
+             'recent_infection': rng.choice([None, 0, 1]), 'menstrual_phase': rng.choice([None, 'NA', 'luteal'])}
+        for f in numeric:
+            r = rng.random()
+            if r < p_missing:
+                if rng.random() < 0.8:
+                    e[f] = None
+            else:
+                e[f] = rng.randint(0, 10) if r < 0.9 else rng.randint(0, 20) / 2
+        for f, values in categorical.items():
+            r = rng.random()
+            if r < p_missing:
+                choice = rng.choice([None, '', 'absent'])
+                if choice != 'absent':
+                    e[f] = choice
+            else:
+                e[f] = rng.choice(values[:rng.randint(1, len(values))])
+        entries.append(e)
+    return entries
+
+
+def legacy_score_screening(answers, model=None, label_encoder=None):
+    """The branch-by-branch scoring from the original api_save_screening, kept as the reference.
+
+    Returns (modular_total_score, risk_probability, risk_category, is_eligible).
+    """
+    import numpy as np
+    import pandas as pd
+    wpi_score, sss_score, first_score = answers.wpi_score, answers.sss_score, answers.first_score
+    duration_4_weeks = answers.duration_4_weeks
+    rule1_met = False
+    if (2 <= wpi_score <= 3 and 4 <= sss_score <= 5):
+        rule1_met = True
+    elif (wpi_score >= 4 and sss_score >= 4):
+        rule1_met = True
+    elif (sss_score >= 6 and wpi_score > 0 and duration_4_weeks):
+        rule1_met = True
+    rule2_met = wpi_score >= 2
+    rule3_met = duration_4_weeks
+    primary_scaled = 1.0 if (rule1_met or rule2_met or rule3_met) else 0.0
+    secondary_score_norm = answers.secondary_count / 10.0
+    risk_sum = 0.0
+    for _ in range(answers.risk_factor_count):
+        risk_sum += 0.25
+    if answers.female:
+        risk_sum += 0.25
+    risk_factor_fraction = risk_sum / 1.75
+    if risk_factor_fraction > 1.0:
+        risk_factor_fraction = 1.0
+    modular_total_score = (primary_scaled * 0.6) + (secondary_score_norm * 0.3) + (risk_factor_fraction * 0.1)
+
+    risk_category = "Low"
+    if modular_total_score >= 0.61:
+        risk_category = "High"
+    elif modular_total_score >= 0.31:
+        risk_category = "Moderate"
+    total_risk_score = float(modular_total_score)
+    if model is not None and label_encoder is not None:
+        input_features = pd.DataFrame([{
+            "WPI": wpi_score, "SSS": sss_score, "pain_regions": wpi_score,
+            "symptom_persistence": 6 if duration_4_weeks else 1,
+            "secondary_score_norm": secondary_score_norm, "risk_factor_fraction": risk_factor_fraction,
+            "rf_total": risk_sum, "modular_total_score": modular_total_score
+        }])
+        risk_category = label_encoder.inverse_transform([model.predict(input_features)[0]])[0]
+        probs = model.predict_proba(input_features)[0]
+        classes = label_encoder.classes_
+        if "High" in classes:
+            total_risk_score = float(probs[np.where(classes == "High")[0][0]])
+        else:
+            total_risk_score = float(max(probs))
+        if modular_total_score >= 0.7:
+            risk_category = "High"
+    if first_score >= 5 and risk_category == "Low":
+        risk_category = "Moderate"
+    return modular_total_score, total_risk_score, risk_category, risk_category in ["High", "Moderate"]
+
+
+
+def screening_answer_grid(app):
+    """Every ScreeningAnswers with WPI 0-19, SSS 0-12, FiRST 0-6, 0-10 secondary and 0-6 risk factors."""
+    import itertools
+    return [app.ScreeningAnswers(*a) for a in itertools.product(
+        range(20), range(13), range(7), range(11), range(7), (False, True), (False, True))]
+
+
+def fit_standin_screening_model(app):
+    """A LogisticRegression over SCREENING_FEATURES on synthetic rows, for trees without fibro_risk_model.pkl."""
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import LabelEncoder
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((2000, 8)) * [19, 12, 19, 6, 1, 1, 1.75, 1], columns=app.SCREENING_FEATURES)
+    y = np.where(X['modular_total_score'] > 0.6, 'High', np.where(X['SSS'] > 6, 'Moderate', 'Low'))
+    le = LabelEncoder()
+    return LogisticRegression(max_iter=2000).fit(X, le.fit_transform(y)), le
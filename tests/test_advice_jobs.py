@@ -0,0 +1,30 @@
+import time
+
+
+def wait_for(jobs, key):
+    for _ in range(200):
+        job = jobs.get(key)
+        if job is None or job[0] != 'pending':
+            return job
+        time.sleep(0.01)
+    raise AssertionError('advice job still pending')
+
+
+def test_llm_advice_is_cached_and_fallbacks_are_not(app):
+    jobs = app.AdviceJobs(lambda prompt, fallback: (f'advice for {prompt}', True), fallback_ttl=0)
+    key, _, _ = jobs.submit({'n': 1}, 'p1')
+    assert wait_for(jobs, key) == ('ready', 'advice for p1')
+
+    jobs = app.AdviceJobs(lambda prompt, fallback: (fallback, False), fallback_ttl=0)
+    key, _, _ = jobs.submit({'n': 1}, 'p1', 'rest more')
+    time.sleep(0.05)
+    assert jobs.get(key) is None                  # expired at once, so the next report retries
+
+
+def test_a_crashing_job_is_marked_failed(app):
+    def generate(prompt, fallback):
+        raise RuntimeError('boom')
+    jobs = app.AdviceJobs(generate)
+    key, _, _ = jobs.submit({'n': 2}, 'p2', 'rest more')
+    assert wait_for(jobs, key) == ('failed', 'rest more')
+    assert jobs.stats()['failed'] == 1
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from tests.reference import legacy_week_metrics, random_pain_weeks
+
+
+def kernel_rows(app, pain, n_valid):
+    k = app.weekly_pain_kernel(pain, n_valid)
+    return [(float(k['mean_pain'][i]), float(k['pain_std'][i]), float(k['trend_slope'][i]),
+             int(k['flare_count'][i]), str(k['risk_level'][i])) for i in range(len(pain))]
+
+
+def test_kernel_matches_the_per_patient_code_on_random_weeks(app):
+    pain, n_valid = random_pain_weeks(5000)
+    lists = [[float(v) for v in row if not np.isnan(v)] for row in pain]
+    expected = [legacy_week_metrics(app, vals, int(n)) for vals, n in zip(lists, n_valid)]
+    assert kernel_rows(app, pain, n_valid) == expected
+
+
+@pytest.mark.parametrize('week', [
+    [],                                      # nothing logged
+    [5],                                     # a single day: no std or slope
+    [4, 4, 4, 4, 4, 4, 4],                   # flat: std 0, threshold is mean + 1
+    [2, 2, 2, 2, 2, 2, 10],                  # one spike over mean + 2*std
+    [7.5, 8, 8, 8.5],                        # mean > 7 with the minimum 4 days
+    [3, 4, 5],                               # under 4 days: insufficient_data
+    [0, 10, 0, 10, 0, 10, 0],
+])
+def test_kernel_matches_the_per_patient_code_on_edge_weeks(app, week):
+    pain = np.full((1, 7), np.nan)
+    pain[0, :len(week)] = week
+    n_valid = np.array([len(week)])
+    assert kernel_rows(app, pain, n_valid) == [legacy_week_metrics(app, [float(v) for v in week], len(week))]
@@ -0,0 +1,38 @@
+import pytest
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def test_parquet_export_keeps_half_point_scores(app, conn, make_user, tmp_path):
+    user_id = make_user()
+    with conn:
+        conn.executemany('INSERT INTO daily_entries (user_id, entry_date, pain_score, stress_score, sleep_hours) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         [(user_id, '2025-03-01', 6, 3, 7.5), (user_id, '2025-03-02', 6.5, None, 8)])
+
+    result = app.app.test_cli_runner().invoke(args=[
+        'export-cohort', '--table', 'daily_entries', '--format', 'parquet',
+        '--out', str(tmp_path), '--user', str(user_id), '--chunk-size', '1'])
+    assert result.exit_code == 0, result.output
+
+    table = pq.read_table(tmp_path / 'daily_entries.parquet')
+    assert table.column('pain_score').to_pylist() == [6, 6.5]
+    assert table.column('stress_score').to_pylist() == [3, None]
+    assert table.column('id').type == 'int64'
+
+
+def test_parquet_schema_is_probed_on_the_exported_rows_only(app, conn, make_user, tmp_path):
+    other, user_id = make_user(), make_user()
+    with conn:
+        conn.executemany('INSERT INTO daily_entries (user_id, entry_date, pain_score, workload) VALUES (?, ?, ?, ?)',
+                         [(other, '2025-03-01', 6.5, 7), (user_id, '2025-03-01', 6, None),
+                          (user_id, '2025-04-01', 2.5, 'Heavy')])
+
+    result = app.app.test_cli_runner().invoke(args=[
+        'export-cohort', '--table', 'daily_entries', '--format', 'parquet', '--out', str(tmp_path),
+        '--user', str(user_id), '--to', '2025-03-31'])
+    assert result.exit_code == 0, result.output
+
+    table = pq.read_table(tmp_path / 'daily_entries.parquet')
+    assert table.column('pain_score').type == 'int64'
+    assert table.column('pain_score').to_pylist() == [6]
@@ -0,0 +1,42 @@
+import pytest
+
+ENTRY = {'pain_score': 5, 'fatigue_score': 4, 'sleep_quality': 6}
+
+
+@pytest.mark.parametrize('value', ['2024-1-5', '2024-01-5', '20240105', '2024-W01-5', 20240105, None])
+def test_only_canonical_entry_dates_are_accepted(app, value):
+    assert app.validate_daily_entry_extended(dict(ENTRY, entry_date=value))[0] is False
+
+
+def test_non_canonical_dates_are_rejected_on_every_write_path(conn, make_user, client_for):
+    user_id = make_user()
+    client = client_for(user_id)
+
+    assert client.post('/api/daily-entry', json=dict(ENTRY, entry_date='2024-1-5')).status_code == 400
+    body = client.post('/api/daily-entries/bulk', json=[dict(ENTRY, entry_date='2024-1-6'),
+                                                       dict(ENTRY, entry_date='2024-01-07')]).get_json()
+    assert [r['status'] for r in body['results']] == ['invalid', 'created']
+    assert client.get('/api/weekly-summary?week_start=2024-1-1').status_code == 400
+    assert client.get('/api/daily-entries?from=2024-1-1').status_code == 400
+
+    dates = [r[0] for r in conn.execute('SELECT entry_date FROM daily_entries WHERE user_id = ?', (user_id,))]
+    assert dates == ['2024-01-07']
+
+
+def test_entry_list_is_unpaginated_unless_asked(app, conn, make_user, client_for):
+    user_id = make_user()
+    conn.executemany('INSERT INTO daily_entries (user_id, entry_date, pain_score) VALUES (?, ?, 5)',
+                     [(user_id, f'2023-{m:02d}-{d:02d}') for m in range(1, 13) for d in range(1, 11)])
+    conn.commit()
+    client = client_for(user_id)
+
+    body = client.get('/api/daily-entries').get_json()
+    assert list(body) == ['entries'] and len(body['entries']) == 120
+    assert all(e['user_id'] == user_id for e in body['entries'])
+
+    page = client.get('/api/daily-entries?limit=50').get_json()
+    assert len(page['entries']) == 50 and page['next_cursor']
+    rest = client.get(f"/api/daily-entries?cursor={page['next_cursor']}").get_json()
+    assert len(rest['entries']) == 70 and rest['next_cursor'] is None
+    assert [e['entry_date'] for e in page['entries'] + rest['entries']] == \
+        [e['entry_date'] for e in body['entries']]
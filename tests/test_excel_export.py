@@ -0,0 +1,27 @@
+import tempfile
+
+
+def test_export_temp_file_is_removed_even_if_the_body_is_never_read(conn, make_user, client_for,
+                                                                     tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    user_id = make_user()
+    with conn:
+        conn.execute("INSERT INTO daily_entries (user_id, entry_date, pain_score) VALUES (?, '2025-03-03', 4)",
+                     (user_id,))
+    client = client_for(user_id)
+
+    # The test client leaves close() to the caller; a WSGI server always calls it
+    resp = client.head('/api/report/final/export-excel')
+    assert resp.status_code == 200
+    resp.close()
+    assert list(tmp_path.iterdir()) == []
+
+    resp = client.get('/api/report/final/export-excel', buffered=False)
+    assert resp.status_code == 200
+    assert list(tmp_path.iterdir())                  # the workbook waits on disk for the body
+    resp.close()                                     # client went away before the first chunk
+    assert list(tmp_path.iterdir()) == []
+
+    body = client.get('/api/report/final/export-excel').data
+    assert body[:2] == b'PK'
+    assert list(tmp_path.iterdir()) == []
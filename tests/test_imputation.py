@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from tests.reference import legacy_impute_daily_data, random_entry_history
+
+NUMERIC = ['pain_score', 'fatigue_score', 'stress_score', 'mood_score',
+           'sleep_quality', 'cognitive_difficulty', 'sensory_score']
+CATEGORICAL = {'physical_activity_level': ['low', 'moderate', 'high'],
+               'sleep_duration_category': ['<5', '5-7', '>7'],
+               'workload': ['Light', 'Moderate', 'Heavy', 'None']}
+
+
+def typed(rows):
+    # 5 and 5.0 compare equal; the imputed copies must keep the logged type too
+    return [{k: (type(v).__name__, v) for k, v in r.items()} for r in rows]
+
+
+def assert_parity(app, users):
+    batched = app.impute_daily_batch(users)
+    assert len(batched) == len(users)
+    for entries, got in zip(users, batched):
+        assert typed(got) == typed(legacy_impute_daily_data(entries)), entries
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_batch_matches_the_legacy_loop_on_random_histories(app, seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        assert_parity(app, [random_entry_history(rng, 30) for _ in range(rng.randint(1, 6))])
+
+
+def test_imputation_never_crosses_users_or_fills_protected_fields(app):
+    first = [{'entry_date': '2025-01-01', 'pain_score': 7, 'workload': 'Heavy', 'recent_infection': 1}]
+    second = [{'entry_date': '2025-01-01', 'pain_score': None, 'workload': None, 'recent_infection': None},
+              {'entry_date': '2025-01-02', 'pain_score': None, 'workload': '', 'recent_infection': None}]
+    assert app.impute_daily_batch([first, second])[1] == second
+    assert_parity(app, [first, second])
+
+
+def test_locf_stops_after_two_missing_days(app):
+    days = [{'pain_score': 6}, {'pain_score': None}, {'pain_score': None}, {'pain_score': None}, {'pain_score': 2}]
+    assert [d['pain_score'] for d in app.impute_daily_batch([days])[0]] == [6, 6, 6, None, 2]
+
+
+def test_batch_matches_the_legacy_loop_property(app):
+    hypothesis = pytest.importorskip('hypothesis')
+    st = pytest.importorskip('hypothesis.strategies')
+
+    missing = st.sampled_from([None])
+    numeric = st.one_of(missing, st.integers(0, 10), st.integers(0, 20).map(lambda v: v / 2))
+    entry = st.fixed_dictionaries(
+        {'recent_infection': st.sampled_from([None, 0, 1]), 'menstrual_phase': st.sampled_from([None, 'NA', 'luteal'])},
+        optional={**{f: numeric for f in NUMERIC},
+                  **{f: st.one_of(st.sampled_from([None, '']), st.sampled_from(values))
+                     for f, values in CATEGORICAL.items()}})
+    histories = st.lists(st.lists(entry, max_size=20), min_size=1, max_size=5)
+
+    @hypothesis.settings(max_examples=200, deadline=None)
+    @hypothesis.given(histories)
+    def check(users):
+        assert_parity(app, users)
+
+    check()
@@ -0,0 +1,6 @@
+def test_metrics_are_admin_only(make_user, client_for):
+    assert client_for(make_user()).get('/api/metrics').status_code == 403
+    assert client_for(make_user(role='staff')).get('/api/metrics').status_code == 403
+
+    body = client_for(make_user(role='admin')).get('/api/metrics').get_json()
+    assert {'db_pool', 'response_cache', 'models'} <= set(body)
@@ -0,0 +1,74 @@
+import json
+import random
+from datetime import date, timedelta
+
+import pytest
+
+# Hot per-user queries, as issued by the routes in app.py
+HOT_QUERIES = [
+    ('daily_entries by user', 'SELECT * FROM daily_entries WHERE user_id = ? ORDER BY entry_date ASC', (1,)),
+    ('daily_entries by user desc', 'SELECT * FROM daily_entries WHERE user_id = ? ORDER BY entry_date DESC', (1,)),
+    ('daily_entries week range',
+     'SELECT * FROM daily_entries WHERE user_id = ? AND entry_date BETWEEN ? AND ? ORDER BY entry_date',
+     (1, '2025-01-01', '2025-01-07')),
+    ('daily_entries keyset page',
+     'SELECT * FROM daily_entries WHERE user_id = ? AND entry_date <= ? AND (entry_date < ? OR id < ?) '
+     'ORDER BY entry_date DESC, id DESC LIMIT ?',
+     (1, '2025-03-01', '2025-03-01', 60, 101)),
+    ('first/last entry date',
+     'SELECT (SELECT MIN(entry_date) FROM daily_entries WHERE user_id = ?), '
+     '(SELECT MAX(entry_date) FROM daily_entries WHERE user_id = ?)', (1, 1)),
+    ('daily_entries one day', 'SELECT * FROM daily_entries WHERE user_id = ? AND entry_date = ?', (1, '2025-01-01')),
+    ('chart daily pain',
+     'SELECT entry_date, pain_score FROM daily_entries WHERE user_id = ? AND entry_date BETWEEN ? AND ? ORDER BY entry_date',
+     (1, '2025-01-01', '2025-01-30')),
+    ('chart weekly heatmap',
+     'SELECT entry_date, fatigue_score, stress_score, sleep_quality, mood_score, workload FROM daily_entries '
+     'WHERE user_id = ? AND entry_date BETWEEN ? AND ? ORDER BY entry_date',
+     (1, '2025-01-01', '2025-03-25')),
+    ('tracking day', 'SELECT COUNT(DISTINCT entry_date) as days_logged FROM daily_entries WHERE user_id = ?', (1,)),
+    ('days logged', 'SELECT COUNT(*) FROM daily_entries WHERE user_id = ?', (1,)),
+    ('trigger window',
+     "SELECT stress_score, sleep_quality FROM daily_entries WHERE user_id = ? AND entry_date >= date('now', '-14 days') ORDER BY entry_date",
+     (1,)),
+    ('recent risk levels',
+     'SELECT weekly_risk_level FROM analysis_result WHERE patient_id = ? ORDER BY period_end DESC LIMIT 4', (1,)),
+    ('latest analysis', 'SELECT * FROM analysis_result WHERE patient_id = ? ORDER BY period_end DESC LIMIT 1', (1,)),
+    ('weekly summaries', 'SELECT * FROM weekly_summary WHERE user_id = ? ORDER BY week_start DESC', (1,)),
+    ('final report weeks', 'SELECT * FROM weekly_summary WHERE user_id = ? ORDER BY week_start', (1,)),
+    ('latest screening', 'SELECT * FROM screenings WHERE user_id = ? ORDER BY created_at DESC LIMIT 1', (1,)),
+    ('weekly logs', 'SELECT * FROM weekly_log WHERE user_id = ? ORDER BY week_start_date DESC', (1,)),
+    ('tracking status', 'SELECT * FROM tracking_status WHERE patient_id = ?', (1,)),
+]
+
+
+def plan_problems(conn, sql, params):
+    """Return the EXPLAIN QUERY PLAN lines that indicate a full scan or temp sort."""
+    plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()]
+    return plan, [line for line in plan
+                  if (line.startswith('SCAN') and line != 'SCAN CONSTANT ROW') or 'USE TEMP B-TREE' in line]
+
+
+@pytest.fixture(scope='module')
+def planner_conn():
+    """A connection over a few users with 120 days each, ANALYZEd like a live database."""
+    import app
+    rng = random.Random(42)
+    conn = app.get_db_connection()
+    with conn:
+        for u in range(5):
+            user_id = conn.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)',
+                                   (f'plans_{u}', 'x')).lastrowid
+            conn.executemany(
+                'INSERT INTO daily_entries (user_id, entry_date, pain_score, sss, workload) VALUES (?, ?, ?, ?, ?)',
+                [(user_id, (date(2025, 1, 1) + timedelta(days=d)).isoformat(), rng.randint(0, 10),
+                  json.dumps({'fatigue': rng.randint(0, 3)}), rng.choice(['Light', 'Heavy'])) for d in range(120)])
+    conn.execute('ANALYZE')
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('name, sql, params', HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_is_index_backed(planner_conn, name, sql, params):
+    plan, problems = plan_problems(planner_conn, sql, params)
+    assert not problems, f"{name}: {' | '.join(plan)}"
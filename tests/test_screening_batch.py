@@ -0,0 +1,30 @@
+FORM = {
+    'first_answers': {'f1': True, 'f2': True},
+    'wpi_regions': ['neck', 'lower_back', 'left_hip'],
+    'sss_answers': {'fatigue': 2, 'sleep': 1, 'cognitive': 1},
+    'risk_factors': {'r1': True},
+    'duration_4_weeks': True,
+}
+
+
+def test_batch_is_staff_only(make_user, client_for):
+    resp = client_for(make_user()).post('/api/screening/batch', json=[dict(FORM, respondent_id='R1', sex='Male')])
+    assert resp.status_code == 403
+
+
+def test_batch_forms_are_stored_apart_from_the_operator(conn, make_user, client_for):
+    operator = make_user(role='staff', sex='Female')
+    resp = client_for(operator).post('/api/screening/batch', json=[
+        dict(FORM, respondent_id='R1', sex='Male'),
+        dict(FORM, respondent_id='R2'),          # no sex: never borrowed from the operator's profile
+        dict(FORM, sex='Female'),                # no respondent
+    ])
+    body = resp.get_json()
+    assert (body['created'], body['invalid']) == (1, 2)
+    assert body['results'][0]['respondent_id'] == 'R1'
+    assert [r['status'] for r in body['results']] == ['created', 'invalid', 'invalid']
+
+    rows = conn.execute('SELECT respondent_id, sex FROM community_screenings WHERE entered_by = ?',
+                        (operator,)).fetchall()
+    assert [tuple(r) for r in rows] == [('R1', 'Male')]
+    assert conn.execute('SELECT COUNT(*) FROM screenings WHERE user_id = ?', (operator,)).fetchone()[0] == 0
@@ -0,0 +1,71 @@
+import random
+import warnings
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip('pandas')
+LogisticRegression = pytest.importorskip('sklearn.linear_model').LogisticRegression
+LabelEncoder = pytest.importorskip('sklearn.preprocessing').LabelEncoder
+
+from tests.reference import fit_standin_screening_model, screening_answer_grid  # noqa: E402
+
+
+def fit(columns):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((200, len(columns))), columns=columns)
+    y = np.array(['Low', 'Moderate', 'High'])[np.minimum((X.iloc[:, 0] * 3).astype(int), 2)]
+    le = LabelEncoder()
+    return LogisticRegression().fit(X, le.fit_transform(y)), le
+
+
+def test_feature_name_warning_is_only_silenced_inside_predict(app):
+    filters = list(warnings.filters)
+    predictor = app.ScreeningModel(*fit(list(app.SCREENING_FEATURES)))
+    assert warnings.filters == filters
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        predictor.predict([np.ones(3)] * len(app.SCREENING_FEATURES))
+        assert not caught
+        # Any other model given unnamed input still warns
+        other, _ = fit(['a', 'b'])
+        other.predict(np.ones((1, 2)))
+        assert any('valid feature names' in str(w.message) for w in caught)
+
+
+def test_stale_compact_export_falls_back_to_the_pickles(app, tmp_path, monkeypatch):
+    joblib = pytest.importorskip('joblib')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, 'SCREENING_MODEL_NPZ', str(tmp_path / 'fibro_risk_model.npz'))
+    model, le = fit(list(app.SCREENING_FEATURES))
+    joblib.dump(model, app.SCREENING_MODEL_PKL)
+    joblib.dump(le, app.SCREENING_LE_PKL)
+    app.CompactScreeningModel.from_sklearn(model, le, app.screening_pickle_digest()).save(app.SCREENING_MODEL_NPZ)
+
+    loaded, _ = app._load_screening_model(app.ModelRegistry())
+    assert isinstance(loaded, app.CompactScreeningModel)
+
+    # Retrained without re-exporting: the pickle wins
+    retrained, le = fit(list(reversed(app.SCREENING_FEATURES)))
+    joblib.dump(retrained, app.SCREENING_MODEL_PKL)
+    loaded, _ = app._load_screening_model(app.ModelRegistry())
+    assert isinstance(loaded, LogisticRegression)
+    np.testing.assert_array_equal(loaded.coef_, retrained.coef_)
+
+
+def test_compact_export_reproduces_predict_proba_exactly(app, tmp_path):
+    model, le = fit_standin_screening_model(app)
+    path = str(tmp_path / 'model.npz')
+    app.CompactScreeningModel.from_sklearn(model, le).save(path)
+    compact = app.CompactScreeningModel.load(path)
+
+    rng = np.random.default_rng(5)
+    X = rng.random((10000, len(app.SCREENING_FEATURES))) * [19, 12, 19, 6, 1, 1, 1.75, 1]
+    X[:, [0, 1, 2, 3]] = np.round(X[:, [0, 1, 2, 3]])
+    np.testing.assert_array_equal(compact.predict_proba(X),
+                                  model.predict_proba(pd.DataFrame(X, columns=app.SCREENING_FEATURES)))
+
+    sample = random.Random(5).sample(screening_answer_grid(app), 5000)
+    assert app.score_screenings(sample, app.ScreeningModel(compact, compact.label_encoder())) == \
+        app.score_screenings(sample, app.ScreeningModel(model, le))
@@ -0,0 +1,28 @@
+import random
+
+
+def trigger_rows(seed, days=14):
+    rng = random.Random(seed)
+    return [{'stress_score': rng.randint(0, 10), 'sleep_quality': rng.randint(0, 10),
+             'weather_sensitivity_bool': rng.random() < 0.3, 'sensory_score': rng.randint(0, 10),
+             'recent_infection': rng.random() < 0.1, 'menstrual_phase': rng.choice(['NA', 'luteal']),
+             'cognitive_difficulty': rng.randint(0, 10), 'mood_score': rng.randint(0, 10)}
+            for _ in range(days)]
+
+
+def test_fits_survive_a_fresh_process(app, conn, make_user):
+    user_id = make_user()
+    rows = trigger_rows(1)
+    first = app.TriggerClusterer()
+    result = first.detect(user_id, rows)
+    with conn:
+        assert first.save_state(conn, [user_id]) == 1
+        assert first.save_state(conn, [user_id]) == 0      # nothing refitted since
+
+    # A new clusterer (next CLI run, another worker) starts from the stored fit
+    second = app.TriggerClusterer()
+    assert second.load_state(conn, [user_id]) == 1
+    assert second.detect(user_id, rows) == result
+    assert second.detect(user_id, trigger_rows(2) + rows[:7])[1] in (0, 1)
+    counts, _ = second.counters()
+    assert (counts['skipped'], counts['warm_start'], counts['cold_start']) == (1, 1, 0)
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+
+def add_entries(conn, user_id, days):
+    with conn:
+        conn.executemany(
+            'INSERT INTO daily_entries (user_id, entry_date, pain_score, stress_score, mood_score) VALUES (?, ?, ?, ?, ?)',
+            [(user_id, d.isoformat(), 5, 4, 6) for d in days])
+
+
+def test_week_numbers_follow_the_calendar_across_a_gap(app, conn, make_user, client_for):
+    user_id = make_user()
+    week1 = date(2025, 1, 7)                      # a Tuesday; week 1 starts Monday 2025-01-06
+    add_entries(conn, user_id, [week1 + timedelta(days=i) for i in range(3)])
+    add_entries(conn, user_id, [week1 + timedelta(days=14 + i) for i in range(3)])   # nothing logged in week 2
+
+    weeks = app.aggregate_weekly(conn, user_id)
+    assert [(w['week_number'], w['week_start']) for w in weeks] == [(1, '2025-01-06'), (3, '2025-01-20')]
+    assert client_for(user_id).get('/api/dashboard/weekly').get_json() == weeks
+
+    # Every number the dashboard offers resolves to the same week in the report endpoints
+    for w in weeks:
+        payload, error = app.build_week_payload(conn, user_id, w['week_number'])
+        assert error is None
+        assert (payload['week_start'], payload['week_end']) == (w['week_start'], w['week_end'])
+    assert app.build_week_payload(conn, user_id, 2) == (None, ('No data available for this week', 404))
+
+
+def stored_weeks(conn, user_id):
+    return [r[0] for r in conn.execute('SELECT week_start FROM weekly_summary WHERE user_id = ? ORDER BY week_start',
+                                       (user_id,))]
+
+
+def test_weekly_summary_only_stores_monday_aligned_weeks(app, conn, make_user, client_for):
+    user_id = make_user()
+    add_entries(conn, user_id, [date(2026, 10, 5) + timedelta(days=i) for i in range(10)])
+    with conn:
+        app.refresh_weekly_summary(conn, user_id, '2026-10-05')
+    client = client_for(user_id)
+
+    body = client.get('/api/weekly-summary?week_start=2026-10-07').get_json()
+    assert (body['week_start'], body['week_end'], body['averages']['avg_pain']) == ('2026-10-07', '2026-10-13', 5)
+    assert client.get('/api/weekly-summary?date=2026-10-14').get_json()['week_start'] == '2026-10-12'
+    assert stored_weeks(conn, user_id) == ['2026-10-05', '2026-10-12']
+    assert len(client.get('/api/weekly-summaries').get_json()['weekly_summaries']) == 2
+
+
+def test_migration_drops_misaligned_weekly_summaries(app, conn, make_user):
+    user_id = make_user()
+    add_entries(conn, user_id, [date(2026, 10, 5) + timedelta(days=i) for i in range(3)])
+    with conn:
+        app.refresh_weekly_summary(conn, user_id, '2026-10-05')
+        conn.execute("INSERT INTO weekly_summary (user_id, week_start, week_end, week_number, averages) "
+                     "VALUES (?, '2026-10-07', '2026-10-13', 41, '{}')", (user_id,))
+        conn.execute('PRAGMA user_version = 4')
+    app.check_and_migrate_db()
+    assert stored_weeks(conn, user_id) == ['2026-10-05']
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == app.SCHEMA_VERSION
+
+
+def test_week_payload_callers_cannot_change_the_cached_copy(app, conn, make_user):
+    user_id = make_user()
+    add_entries(conn, user_id, [date(2025, 2, 3) + timedelta(days=i) for i in range(3)])
+
+    for _ in range(2):   # the miss, then the hit
+        week, _ = app.build_week_payload(conn, user_id, 1)
+        week['entries'][0]['pain_score'] = 99
+        week['entries'].clear()
+        week['averages']['avg_pain'] = 0
+
+    week, _ = app.build_week_payload(conn, user_id, 1)
+    assert len(week['entries']) == 3 and week['entries'][0]['pain_score'] == 5
+    assert week['averages']['avg_pain'] == 5
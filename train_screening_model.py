@@ -72,3 +72,5 @@ joblib.dump(le, "fibro_risk_le.pkl")
 
 print("✅ Model saved as 'fibro_risk_model.pkl'")
 print("✅ Label Encoder saved as 'fibro_risk_le.pkl'")
+print("ℹ️ Run 'flask --app app export-screening-model' to refresh fibro_risk_model.npz; "
+      "until then the app ignores the old export and loads these pickles")